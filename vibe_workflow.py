@@ -9,25 +9,246 @@ This script generates the markdown files for the vibe coding workflow:
 4. Copies agents.md with project-specific information
 5. Creates initial_prompt.md for the AI coding assistant
 
-Usage: python vibe_workflow.py <output_dir> <PRODUCT.md> <tools.md>"""
+Usage: python vibe_workflow.py <output_dir> <PRODUCT.md> <tools.md> [options]"""
 
+import asyncio
+import contextlib
+import functools
+import hashlib
+import importlib.util
+import json
+import math
+import operator
 import os
+import re
+import shutil
+import sqlite3
 import sys
+from array import array
 from pathlib import Path
-from typing import Optional
-import openai
+from typing import Callable, Optional, Union
+
+ARCH_MODEL = "gpt-4o"
+TASKS_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-small"
+CACHE_SIMILARITY = 0.98
+BATCH_POLL_INTERVAL = 30
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+TASKS_ARCH_TOKEN_LIMIT = 6000
+MAX_RETRIES = 3
+ARCH_ESTIMATED_CHARS = 6000
+SPECULATIVE_TRIGGER_CHARS = ARCH_ESTIMATED_CHARS * 4 // 5
+SPECULATIVE_MAX_TAIL_CHARS = 1500
+_AGENTS_PATH = Path(__file__).resolve().parent / "agents.md"
+_INITIAL_PROMPT = """You're an engineer building this codebase. You've been given architecture.md, tasks.md and agents.md. Read all three of them carefully. There should be no ambiguity about what we're building. Follow tasks.md and complete one task at a time. After each task, stop. I'll test it. If it works, commit to GitHub and move to the next task.""".encode("utf-8")
+
+
+@functools.lru_cache(maxsize=1)
+def _load_agents_template() -> bytes:
+    """Read the agents.md template that ships next to this script, once per process."""
+    return _AGENTS_PATH.read_bytes()
+
+
+def _default_cache_path() -> Path:
+    """Location of the response cache, resolved only when the cache is opened."""
+    return Path.home() / ".vibe_cache" / "cache.sqlite"
+
+
+def _encode_jsonl(record: dict) -> bytes:
+    """Encode one compact JSONL line (no padding whitespace, raw UTF-8)."""
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _batch_line_error(line: dict) -> Optional[str]:
+    """Describe the failure recorded in one batch output/error line, or None if it succeeded."""
+    if line.get("error"):
+        return f"{line['error'].get('code')}: {line['error'].get('message')}"
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        error = (response.get("body") or {}).get("error") or {}
+        return f"HTTP {response.get('status_code')}: {error.get('message', 'unknown error')}"
+    return None
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _compact_markdown(text: str) -> str:
+    """Collapse blank-line runs and inner whitespace, keeping indentation."""
+    text = re.sub(r"[ \t]+$", "", text, flags=re.M)
+    text = re.sub(r"(?<=\S)[ \t]{2,}", " ", text)
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})(.*)$")
+_HEADING = re.compile(r"^ {0,3}#{1,6}(?:\s|$)")
+
+
+def _markdown_blocks(text: str) -> list[str]:
+    """Split markdown into blocks at blank lines and before headings, never
+    inside a code fence.
+
+    A fence only closes on a line of the same character that is at least as
+    long as the opening marker, so nested or mixed fences stay together.
+    """
+    blocks, current, fence = [], [], None
+    for line in text.split("\n"):
+        match = _FENCE.match(line)
+        if fence:
+            current.append(line)
+            if (match and match.group(1)[0] == fence[0]
+                    and len(match.group(1)) >= len(fence) and not match.group(2).strip()):
+                fence = None
+            continue
+        if match:
+            fence = match.group(1)
+        elif not line.strip() or _HEADING.match(line):
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            if not line.strip():
+                continue
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def _outline_markdown(text: str) -> str:
+    """Reduce a markdown document to its headings plus the first paragraph of each section.
+
+    Fenced code blocks are handled whole: one counts as a section's first
+    paragraph, and `#` comments inside it are never taken for headings.
+    """
+    kept, keep_next = [], True
+    for block in _markdown_blocks(text):
+        if _HEADING.match(block):
+            kept.append(block)
+            keep_next = "\n" not in block
+        elif keep_next:
+            kept.append(block)
+            keep_next = False
+    return "\n\n".join(kept)
+
+
+class SemanticCache:
+    """Cache of LLM responses keyed by prompt.
+
+    Rows live in a small SQLite file and are loaded into memory on open.
+    Lookups match the exact (model, prompt) pair by hash. Reusing the
+    response of a merely similar prompt is a separate, opt-in lookup by
+    embedding: the prompts are mostly fixed template text, so small but
+    important edits (e.g. one database swapped for another) barely move
+    the embedding.
+    """
+
+    def __init__(self, path: Optional[Path] = None, threshold: float = CACHE_SIMILARITY):
+        path = path or _default_cache_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.db = sqlite3.connect(path)
+        self.exact = {}
+        self.rows = []
+        try:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS cached_responses ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, prompt TEXT NOT NULL, "
+                "embedding BLOB, response TEXT NOT NULL)"
+            )
+            for key, model, embedding, response in self.db.execute(
+                    "SELECT key, model, embedding, response FROM cached_responses"):
+                self.exact[key] = response
+                if embedding is not None:
+                    self.rows.append((model, array("f", embedding), response))
+        except sqlite3.Error:
+            self.db.close()
+            raise
+
+    @staticmethod
+    def _key(model: str, prompt: str) -> str:
+        """Hash a (model, prompt) pair into the exact-match key."""
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> array:
+        """Scale an embedding to unit length so dot product is cosine similarity."""
+        norm = math.sqrt(sum(x * x for x in embedding)) or 1.0
+        return array("f", (x / norm for x in embedding))
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """Return the cached response for exactly this model and prompt."""
+        return self.exact.get(self._key(model, prompt))
+
+    def lookup(self, model: str, embedding: list[float]) -> Optional[tuple[str, float]]:
+        """Return the closest cached response for model above the threshold,
+        together with its similarity."""
+        query = self._normalize(embedding)
+        best, best_score = None, self.threshold
+        for row_model, row_embedding, response in self.rows:
+            if row_model != model:
+                continue
+            score = sum(map(operator.mul, query, row_embedding))
+            if score >= best_score:
+                best, best_score = response, score
+        return (best, best_score) if best is not None else None
+
+    def store(self, model: str, prompt: str, response: str,
+              embedding: Optional[list[float]] = None) -> None:
+        """Persist a response and make it available to later lookups."""
+        key = self._key(model, prompt)
+        vector = self._normalize(embedding) if embedding is not None else None
+        self.db.execute(
+            "INSERT OR REPLACE INTO cached_responses (key, model, prompt, embedding, response) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, model, prompt, vector.tobytes() if vector is not None else None, response),
+        )
+        self.db.commit()
+        self.exact[key] = response
+        if vector is not None:
+            self.rows.append((model, vector, response))
+
 
 class VibeWorkflow:
-    def __init__(self, output_dir: str, product_file: str, tools_file: str):
+    _ARCH_TEMPLATE = """I'm building a {desc}. Use {tools}. Give me the full architecture:
+   - File + folder structure
+   - What each part does
+   - Where state lives, how services connect.
+Format this entire document in markdown.
+Do not use icons or emoticons."""
+
+    _TASKS_TEMPLATE = """Using this architecture:
+
+{architecture}
+
+Write a granular step-by-step plan to build the MVP. Each task should:
+   - Be incredibly small + testable
+   - Have a clear start + end
+   - Focus on one concern
+I'll be passing this off to an engineering LLM that will be told to complete one task at a time, allowing me to test in between. Do not use icons or emoticons."""
+
+    def __init__(self, output_dir: str, product_file: str, tools_file: str,
+                 use_cache: bool = True, similar_cache: bool = False, batch: bool = False,
+                 arch_model: str = ARCH_MODEL, tasks_model: str = TASKS_MODEL,
+                 speculative: bool = False):
+        # Imported here so --help and usage errors skip the slow SDK import
+        import httpx
+        import openai
+
         self.output_dir = Path(output_dir)
         self.product_file = Path(product_file)
         self.tools_file = Path(tools_file)
 
-        # Set up OpenAI
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         if not os.getenv("OPENAI_API_KEY"):
             raise ValueError("OPENAI_API_KEY environment variable not set")
 
+        self.similar_cache = similar_cache
+        self.batch = batch
+        self.arch_model = arch_model
+        self.tasks_model = tasks_model
+        self.speculative = speculative
+
         # Read input files
         self.product_description = self._read_file(self.product_file)
         self.tools_list = self._read_file(self.tools_file)
@@ -35,89 +256,345 @@ class VibeWorkflow:
         # Ensure output directory exists
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
+        # Resources that need closing are opened last, so a failure above
+        # leaves nothing behind; release them with aclose().
+        # The cache is an optimisation only: a home directory that cannot be
+        # written (common in CI) disables it instead of failing the run.
+        self.cache = None
+        if use_cache:
+            try:
+                self.cache = SemanticCache()
+            except (OSError, RuntimeError, sqlite3.Error) as e:
+                print(f"Warning: response cache disabled ({e})")
+
+        # Set up OpenAI with one pooled HTTP client for the lifetime of the
+        # workflow, so the TLS handshake is paid once even across several
+        # runs. HTTP/2 needs the optional h2 package.
+        http_client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=httpx.Timeout(60.0),
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60.0),
+        )
+        # Rate limits, 5xx responses and connection errors are retried by the
+        # SDK with exponential backoff (honouring Retry-After) before giving up.
+        self.client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"),
+                                         http_client=http_client,
+                                         max_retries=MAX_RETRIES)
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client and the response cache."""
+        await self.client.close()
+        if self.cache is not None:
+            self.cache.db.close()
+
+    async def __aenter__(self) -> "VibeWorkflow":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
     def _read_file(self, filepath: Path) -> str:
         """Read content from a file."""
-        if not filepath.exists():
-            raise FileNotFoundError(f"File not found: {filepath}")
-        return filepath.read_text().strip()
+        try:
+            return filepath.read_bytes().decode("utf-8").strip()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {filepath}") from None
 
-    def _save_file(self, filename: str, content: str) -> None:
-        """Save content to a file in the output directory."""
+    def _save_file_sync(self, filename: str, content: Union[bytes, str]) -> Path:
+        """Save content to a file in the output directory and return its path."""
         filepath = self.output_dir / filename
-        filepath.write_text(content)
-        print(f"Created: {filepath}")
+        filepath.write_bytes(content if isinstance(content, bytes) else content.encode("utf-8"))
+        return filepath
+
+    async def _save_file(self, filename: str, content: Union[bytes, str]) -> Path:
+        """Save content to a file without blocking the event loop.
+
+        Nothing is printed from the worker thread; callers report the
+        returned path on the event loop so output lines never interleave.
+        """
+        return await asyncio.to_thread(self._save_file_sync, filename, content)
 
     def generate_architecture_prompt(self) -> str:
         """Generate the prompt for creating architecture.md."""
-        return f"""I'm building a {self.product_description}. Use {self.tools_list}. Give me the full architecture:
-   - File + folder structure
-   - What each part does
-   - Where state lives, how services connect.
-Format this entire document in markdown.
-Do not use icons or emoticons."""
+        return self._ARCH_TEMPLATE.format_map({"desc": self.product_description,
+                                               "tools": self.tools_list})
 
     def generate_tasks_prompt(self, architecture: str) -> str:
-        """Generate the prompt for creating tasks.md."""
-        return f"""Using this architecture:
+        """Generate the prompt for creating tasks.md.
 
-{architecture}
+        The architecture is compacted first, and cut down to an outline if
+        it is still too long, since the whole document is billed as input.
+        """
+        architecture = _compact_markdown(architecture)
+        if _estimate_tokens(architecture) > TASKS_ARCH_TOKEN_LIMIT:
+            architecture = _outline_markdown(architecture)
+        return self._TASKS_TEMPLATE.format_map({"architecture": architecture})
 
-Write a granular step-by-step plan to build the MVP. Each task should:
-   - Be incredibly small + testable
-   - Have a clear start + end
-   - Focus on one concern
-I'll be passing this off to an engineering LLM that will be told to complete one task at a time, allowing me to test in between. Do not use icons or emoticons."""
+    async def call_llm(self, prompt: str, model: str, output_file: Optional[str] = None,
+                       on_partial: Optional[Callable[[str], None]] = None) -> str:
+        """Call OpenAI API with the given prompt using the given chat model.
+
+        If output_file is given, the response is also written to that file
+        in the output directory. When the cache is enabled, an identical
+        earlier prompt short-circuits the call; with similar_cache, so does
+        a prompt whose embedding is nearly the same.
+        on_partial is passed on to _stream_completion when streaming.
+        Errors that survive the client's retries are raised to the caller.
+        """
+        print(f"Prompt size: ~{_estimate_tokens(prompt)} tokens")
+        embedding = None
+        cached = None
+        if self.cache is not None:
+            cached = self.cache.get(model, prompt)
+            if cached is not None:
+                print("Using cached response (identical prompt).")
+            elif self.similar_cache:
+                result = await self.client.embeddings.create(model=EMBEDDING_MODEL, input=prompt)
+                embedding = result.data[0].embedding
+                match = self.cache.lookup(model, embedding)
+                if match is not None:
+                    cached, score = match
+                    print(f"Using cached response for a similar prompt (similarity {score:.3f}).")
+        if cached is not None:
+            if output_file:
+                print(f"Created: {await self._save_file(output_file, cached)}")
+            return cached
+
+        if self.batch:
+            content = await self._call_batch(prompt, model)
+            if output_file:
+                print(f"Created: {await self._save_file(output_file, content)}")
+        else:
+            content = await self._stream_completion(prompt, model, output_file,
+                                                    on_partial=on_partial)
+
+        if self.cache is not None:
+            self.cache.store(model, prompt, content, embedding)
+        return content
+
+    async def _stream_completion(self, prompt: str, model: str, output_file: Optional[str],
+                                 echo: bool = True,
+                                 on_partial: Optional[Callable[[str], None]] = None) -> str:
+        """Stream a chat completion, echoing each delta to stdout as it arrives
+        and writing it straight into output_file if given.
 
-    def call_llm(self, prompt: str) -> str:
-        """Call OpenAI API with the given prompt using gpt-4o-mini."""
+        on_partial, if given, is called once with the text so far when it
+        reaches SPECULATIVE_TRIGGER_CHARS.
+        """
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            stream=True
+        )
+        parts: list[str] = []
+        size = 0
+        out = (self.output_dir / output_file).open("wb") if output_file else None
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                if echo:
+                    print(delta, end="", flush=True)
+                if out:
+                    out.write(delta.encode("utf-8"))
+                size += len(delta)
+                if on_partial and size >= SPECULATIVE_TRIGGER_CHARS:
+                    on_partial("".join(parts))
+                    on_partial = None
+        finally:
+            if out:
+                out.close()
+        if echo:
+            print()
+        if output_file:
+            print(f"Created: {self.output_dir / output_file}")
+        return "".join(parts)
+
+    async def _call_batch(self, prompt: str, model: str) -> str:
+        """Run a single chat completion through the Batch API.
+
+        Batch jobs cost about half as much as synchronous requests but can
+        take up to the 24h completion window. Because the tasks prompt needs
+        the finished architecture, a run submits two batches one after the
+        other, so this mode is meant for non-interactive use (CI, nightly
+        generation) only.
+        """
+        request = {
+            "custom_id": "vibe",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0.7,
+            },
+        }
+        input_file = await self.client.files.create(
+            file=("batch.jsonl", _encode_jsonl(request)),
+            purpose="batch",
+        )
+        batch = None
+        try:
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"Error calling OpenAI API: {e}")
-            sys.exit(1)
+            print(f"Submitted batch {batch.id}, waiting for it to complete...")
+            while batch.status not in BATCH_FINAL_STATUSES:
+                await asyncio.sleep(BATCH_POLL_INTERVAL)
+                batch = await self.client.batches.retrieve(batch.id)
+
+            # A failed request still leaves the batch "completed", with only an
+            # error file; read it here, before the cleanup below deletes it.
+            if batch.status != "completed" or not batch.output_file_id:
+                raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}: "
+                                   f"{await self._batch_errors(batch)}")
+            output = await self.client.files.content(batch.output_file_id)
+            result = json.loads(output.content.splitlines()[0])
+            error = _batch_line_error(result)
+            if error:
+                raise RuntimeError(f"Batch {batch.id} request failed: {error}")
+            return result["response"]["body"]["choices"][0]["message"]["content"]
+        finally:
+            # Don't leave per-run files behind in the user's OpenAI account
+            file_ids = [input_file.id]
+            if batch is not None:
+                file_ids += [batch.output_file_id, batch.error_file_id]
+            for file_id in filter(None, file_ids):
+                try:
+                    await self.client.files.delete(file_id)
+                except Exception as e:
+                    print(f"Warning: could not delete batch file {file_id}: {e}")
+
+    async def _batch_errors(self, batch) -> str:
+        """Collect the error messages of a batch that produced no output."""
+        messages = []
+        if batch.errors and batch.errors.data:
+            messages += [f"{e.code}: {e.message}" for e in batch.errors.data]
+        if batch.error_file_id:
+            errors = await self.client.files.content(batch.error_file_id)
+            for line in errors.content.splitlines():
+                messages.append(_batch_line_error(json.loads(line)) or "unknown error")
+        return "; ".join(messages) or "no error details"
 
-    def get_existing_agents_md(self) -> str:
-        """Get the existing agents.md content from the template."""
-        agents_path = Path(__file__).parent / "agents.md"
-        return agents_path.read_text()
+    def get_existing_agents_md(self) -> bytes:
+        """Get the existing agents.md content from the template.
+
+        run() copies the template file directly; this is for callers that
+        want its contents.
+        """
+        return _load_agents_template()
+
+    async def _copy_agents_md(self) -> Path:
+        """Copy the agents.md template into the output directory and return its path.
+
+        shutil.copyfile uses os.sendfile where available, so the bytes never
+        pass through Python.
+        """
+        filepath = self.output_dir / "agents.md"
+        await asyncio.to_thread(shutil.copyfile, _AGENTS_PATH, filepath)
+        return filepath
 
     def create_initial_prompt(self) -> str:
-        """Create the initial prompt for the AI coding assistant."""
-        return """You're an engineer building this codebase. You've been given architecture.md, tasks.md and agents.md. Read all three of them carefully. There should be no ambiguity about what we're building. Follow tasks.md and complete one task at a time. After each task, stop. I'll test it. If it works, commit to GitHub and move to the next task."""
+        """Create the initial prompt for the AI coding assistant.
+
+        run() writes the pre-encoded _INITIAL_PROMPT directly; this is for
+        callers that want the text.
+        """
+        return _INITIAL_PROMPT.decode("utf-8")
+
+    async def _take_speculative_tasks(self, partial: str, prompt: str, task: asyncio.Task,
+                                      architecture: str) -> Optional[str]:
+        """Return the speculative tasks.md if the architecture written after it
+        started is at most SPECULATIVE_MAX_TAIL_CHARS long, otherwise cancel
+        it and return None.
+
+        An accepted plan never saw that tail, so trailing sections of the
+        architecture may be missing from it. It is cached under the tasks
+        prompt for the full architecture, so an identical rerun (which gets
+        architecture.md from the cache) reuses the same plan.
+        """
+        # Logged here rather than when the request starts, which is in the
+        # middle of the streamed architecture.
+        print(f"Speculative prompt size: ~{_estimate_tokens(prompt)} tokens")
+        tail = len(architecture) - len(partial)
+        if tail > SPECULATIVE_MAX_TAIL_CHARS:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+            print(f"Discarding speculative tasks.md: {tail} characters of the architecture "
+                  "were written after it started.")
+            return None
+        try:
+            tasks = await task
+        except Exception as e:
+            print(f"Speculative tasks.md failed ({e}), requesting it again.")
+            return None
+        print(tasks)
+        if self.cache is not None:
+            self.cache.store(self.tasks_model, self.generate_tasks_prompt(architecture), tasks)
+        if tail:
+            print(f"Note: tasks.md was planned from the first {len(partial)} of "
+                  f"{len(architecture)} characters of architecture.md; "
+                  "sections after that may not be covered.")
+        return tasks
 
-    def run(self) -> None:
+    async def run(self) -> None:
         """Execute the vibe workflow to generate markdown files."""
         print(f"Vibe Workflow - Generating Markdown Files")
         print(f"Product: {self.product_description[:50]}...")
         print(f"Tools: {self.tools_list[:50]}...")
         print(f"Output directory: {self.output_dir}\n")
 
-        # Step 1: Generate architecture.md
-        print("Step 1: Generating architecture.md...")
-        arch_prompt = self.generate_architecture_prompt()
-        architecture = self.call_llm(arch_prompt)
-        self._save_file("architecture.md", architecture)
+        # Step 1: agents.md and initial_prompt.md do not depend on the LLM
+        # output, so they are written on worker threads while the requests
+        # below are in flight; only the network calls are on the critical path.
+        print("Step 1: Creating agents.md and initial_prompt.md...")
+        writes = [
+            asyncio.create_task(self._copy_agents_md()),
+            asyncio.create_task(self._save_file("initial_prompt.md", _INITIAL_PROMPT)),
+        ]
 
-        # Step 2: Generate tasks.md
-        print("Step 2: Generating tasks.md...")
-        tasks_prompt = self.generate_tasks_prompt(architecture)
-        tasks = self.call_llm(tasks_prompt)
-        self._save_file("tasks.md", tasks)
+        # With --speculative, the tasks request is started once most of the
+        # expected architecture has streamed in, overlapping the rest of its
+        # decode. The result is kept only if little was written after that
+        # point; the plan may then miss trailing sections. Otherwise it costs
+        # a second tasks request. Short architectures never trigger it.
+        speculation = {}
+
+        def speculate(partial: str) -> None:
+            tasks_prompt = self.generate_tasks_prompt(
+                partial + "\n\n[The architecture is cut off here; the remaining sections are not written yet.]")
+            speculation["partial"] = partial
+            speculation["prompt"] = tasks_prompt
+            speculation["task"] = asyncio.create_task(
+                self._stream_completion(tasks_prompt, self.tasks_model, None, echo=False))
+
+        # Step 2: Generate architecture.md
+        print("Step 2: Generating architecture.md...")
+        arch_prompt = self.generate_architecture_prompt()
+        architecture = await self.call_llm(arch_prompt, self.arch_model,
+                                           output_file="architecture.md",
+                                           on_partial=speculate if self.speculative else None)
 
-        # Step 3: Copy/create agents.md
-        print("Step 3: Creating agents.md...")
-        agents = self.get_existing_agents_md()
-        self._save_file("agents.md", agents)
+        # Step 3: Generate tasks.md
+        print("Step 3: Generating tasks.md...")
+        tasks = None
+        if speculation:
+            tasks = await self._take_speculative_tasks(
+                speculation["partial"], speculation["prompt"], speculation["task"], architecture)
+        if tasks is None:
+            tasks_prompt = self.generate_tasks_prompt(architecture)
+            tasks = await self.call_llm(tasks_prompt, self.tasks_model)
+        writes.append(asyncio.create_task(self._save_file("tasks.md", tasks)))
 
-        # Step 4: Create initial_prompt.md
-        print("Step 4: Creating initial_prompt.md...")
-        initial_prompt = self.create_initial_prompt()
-        self._save_file("initial_prompt.md", initial_prompt)
+        # Reported only now, so they cannot land inside streamed output
+        for filepath in await asyncio.gather(*writes):
+            print(f"Created: {filepath}")
 
         print(f"\n✅ Markdown files generated successfully!")
         print(f"\nFiles created in {self.output_dir}:")
@@ -127,20 +604,62 @@ I'll be passing this off to an engineering LLM that will be told to complete one
         print("  - initial_prompt.md")
 
 
+async def _run(workflow: VibeWorkflow) -> None:
+    """Run the workflow once and release its client afterwards."""
+    async with workflow:
+        await workflow.run()
+
+
+def _usage(status: int) -> None:
+    """Print command-line usage and exit with the given status."""
+    print("Usage: python vibe_workflow.py <output_dir> <PRODUCT.md> <tools.md> [options]")
+    print("\nExample:")
+    print("  python vibe_workflow.py ./my-project PRODUCT.md tools.md")
+    print("\nOptions:")
+    print("  --no-cache           Always call the model, bypassing the response cache")
+    print("  --similar-cache      Also reuse responses to near-identical prompts")
+    print("  --batch              Use the Batch API (about half the cost, may take hours)")
+    print(f"  --arch-model MODEL   Model for architecture.md (default: {ARCH_MODEL})")
+    print(f"  --tasks-model MODEL  Model for tasks.md (default: {TASKS_MODEL})")
+    print("  --speculative        Start tasks.md before architecture.md is finished")
+    print("                       (faster; may cost an extra tasks request, and the")
+    print("                       plan may miss the last architecture sections)")
+    print("  -h, --help           Show this message and exit")
+    sys.exit(status)
+
+
 def main():
-    if len(sys.argv) != 4:
-        print("Usage: python vibe_workflow.py <output_dir> <PRODUCT.md> <tools.md>")
-        print("\nExample:")
-        print("  python vibe_workflow.py ./my-project PRODUCT.md tools.md")
-        sys.exit(1)
+    # Hand-rolled parsing; the OpenAI SDK is only imported once the
+    # arguments are known to be valid, keeping --help and errors fast.
+    args, options = [], {}
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg in ("-h", "--help"):
+            _usage(0)
+        elif arg in ("--arch-model", "--tasks-model"):
+            value = next(argv, "")
+            options[arg] = "" if value.startswith("--") else value
+        elif arg.startswith("--"):
+            options[arg] = True
+        else:
+            args.append(arg)
+
+    if (len(args) != 3 or "" in options.values()
+            or options.keys() - {"--no-cache", "--similar-cache", "--batch", "--arch-model",
+                                 "--tasks-model", "--speculative"}):
+        _usage(1)
 
-    output_dir = sys.argv[1]
-    product_file = sys.argv[2]
-    tools_file = sys.argv[3]
+    output_dir, product_file, tools_file = args
 
     try:
-        workflow = VibeWorkflow(output_dir, product_file, tools_file)
-        workflow.run()
+        workflow = VibeWorkflow(output_dir, product_file, tools_file,
+                                use_cache="--no-cache" not in options,
+                                similar_cache="--similar-cache" in options,
+                                batch="--batch" in options,
+                                arch_model=options.get("--arch-model", ARCH_MODEL),
+                                tasks_model=options.get("--tasks-model", TASKS_MODEL),
+                                speculative="--speculative" in options)
+        asyncio.run(_run(workflow))
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)